@@ -1,5 +1,118 @@
-import pandas as pd
+import math
+import h5py
 import numpy as np
+import pandas as pd
+from numba import njit, prange
+
+def keypoint_xy_columns(columns):
+    """
+    Resolve the positions of the Left/Middle/Right x and y columns from the stored labels
+
+    Parameters:
+    columns: DeepLabCut (scorer, bodyparts, coords) column MultiIndex
+
+    Returns:
+    int array of column positions for left_x, left_y, middle_x, middle_y, right_x, right_y
+    """
+    if not isinstance(columns, pd.MultiIndex):
+        raise ValueError("Input H5 file does not have a MultiIndex structure!")
+
+    scorer = columns.levels[0][0]  # Assume there's only one scorer
+    labels = [(scorer, bodypart, coord) for bodypart in ('Left', 'Middle', 'Right') for coord in ('x', 'y')]
+    positions = columns.get_indexer(labels)
+    missing = [label[1:] for label, position in zip(labels, positions) if position < 0]
+    if missing:
+        raise ValueError(f"Input H5 file is missing keypoint columns: {missing}")
+    return positions
+
+def read_keypoint_coords(input_file):
+    """
+    Read the Left/Middle/Right x and y columns of a DeepLabCut h5 file
+
+    Parameters:
+    input_file: h5 file path (pandas 'table' or 'fixed' format)
+
+    Returns:
+    float64 column arrays left_x, left_y, middle_x, middle_y, right_x, right_y
+    (views into the block read from disk, so no per-column copies)
+    """
+    # Column labels only (zero rows are read), resolved once per file
+    columns = pd.read_hdf(input_file, stop=0).columns
+    xy_columns = keypoint_xy_columns(columns)
+
+    with h5py.File(input_file, 'r', libver='latest') as h5file:
+        group = h5file[next(iter(h5file))]  # Assume there's only one DataFrame key
+
+        if 'table' in group:
+            # format='table' (DeepLabCut output): values live in one compound field
+            # (float32 for smoothed files written by Smoothing_MovingAverage.py).
+            # Read the records in one pass and take the field view; h5py's per-field
+            # reads go through a slower conversion path
+            dset = group['table']
+            if dset.dtype['values_block_0'].shape != (len(columns),):
+                raise ValueError("Input H5 file stores keypoints in more than one block!")
+            block = dset[:]['values_block_0']
+            if block.dtype != np.float64:
+                block = block.astype(np.float64)
+            coords = tuple(block[:, column] for column in xy_columns)
+        elif 'block0_values' in group:
+            # format='fixed' (pandas default): read the needed columns straight from disk
+            # (h5py needs increasing positions, so read sorted and reorder in memory)
+            dset = group['block0_values']
+            if dset.shape[1] != len(columns):
+                raise ValueError("Input H5 file stores keypoints in more than one block!")
+            sorted_columns = np.sort(xy_columns)
+            block = np.empty((dset.shape[0], len(sorted_columns)), dtype=np.float64)
+            dset.read_direct(block, source_sel=np.s_[:, sorted_columns])
+            coords = tuple(block[:, column] for column in np.searchsorted(sorted_columns, xy_columns))
+        else:
+            raise ValueError("Input H5 file does not contain a pandas DataFrame!")
+
+    return coords
+
+@njit(cache=True)
+def _mean_std(total, total_sq, count):
+    """Mean and sample standard deviation (ddof=1) from running sums"""
+    if count == 0:
+        return np.nan, np.nan
+    mean = total / count
+    if count == 1:
+        return mean, np.nan
+    var = max((total_sq - total * mean) / (count - 1), 0.0)
+    return mean, math.sqrt(var)
+
+# fastmath without 'nnan'/'ninf' so the NaN check below is not optimized away
+@njit(parallel=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, cache=True)
+def angle_stats(lx, ly, mx, my, rx, ry):
+    """
+    Fused left/right angle calculation and statistics in a single pass
+
+    Returns:
+    left mean, left std, right mean, right std (degrees, NaN frames skipped)
+    """
+    sum_l = 0.0
+    sumsq_l = 0.0
+    n_l = 0
+    sum_r = 0.0
+    sumsq_r = 0.0
+    n_r = 0
+    for i in prange(lx.shape[0]):
+        # dy in the mathematical (y-up) frame: (h - ly) - (h - my) = my - ly
+        left_angle = math.degrees(math.atan2(my[i] - ly[i], abs(lx[i] - mx[i])))
+        right_angle = math.degrees(math.atan2(my[i] - ry[i], abs(rx[i] - mx[i])))
+
+        if not math.isnan(left_angle):
+            sum_l += left_angle
+            sumsq_l += left_angle * left_angle
+            n_l += 1
+        if not math.isnan(right_angle):
+            sum_r += right_angle
+            sumsq_r += right_angle * right_angle
+            n_r += 1
+
+    left_mean, left_std = _mean_std(sum_l, sumsq_l, n_l)
+    right_mean, right_std = _mean_std(sum_r, sumsq_r, n_r)
+    return left_mean, left_std, right_mean, right_std
 
 def analyze_barbell_angles(input_file, video_height=1342):
     """
@@ -7,48 +120,25 @@ def analyze_barbell_angles(input_file, video_height=1342):
     
     Parameters:
     input_file: h5 file path
-    video_height: video height, default 1342 but doesn't affect relative angle calculation
+    video_height: video height, kept for compatibility; it cancels out of every dy and is unused
     
     Returns:
     Dictionary containing left and right angle statistics
+    (angles use atan2, so frames with dx == 0 count as +/-90° instead of NaN)
     """
     try:
         # Read h5 file
         print(f"Reading data from {input_file}...")
-        data = pd.read_hdf(input_file)
-
-        # Check if it has MultiIndex structure
-        if not isinstance(data.columns, pd.MultiIndex):
-            raise ValueError("Input H5 file does not have a MultiIndex structure!")
-
-        # Extract index levels
-        scorer = data.columns.levels[0][0]  # Assume there's only one scorer
-        
-        # Create a copy of DataFrame to avoid warnings
-        df = data.copy()
-
-        # Convert Y coordinates to mathematical coordinate system
-        left_y_math = video_height - df[(scorer, 'Left', 'y')]
-        middle_y_math = video_height - df[(scorer, 'Middle', 'y')]
-        right_y_math = video_height - df[(scorer, 'Right', 'y')]
-
-        # Calculate dx and dy relative to the midpoint
-        df['left_dx'] = abs(df[(scorer, 'Left', 'x')] - df[(scorer, 'Middle', 'x')])
-        df['right_dx'] = abs(df[(scorer, 'Right', 'x')] - df[(scorer, 'Middle', 'x')])
-
-        df['left_dy'] = left_y_math - middle_y_math
-        df['right_dy'] = right_y_math - middle_y_math
+        lx, ly, mx, my, rx, ry = read_keypoint_coords(input_file)
 
-        # Calculate angles
-        df['left_angle_deg'] = np.degrees(np.arctan(df['left_dy'] / df['left_dx']))
-        df['right_angle_deg'] = np.degrees(np.arctan(df['right_dy'] / df['right_dx']))
+        # Calculate angles and their statistics in one fused pass
+        left_mean, left_std, right_mean, right_std = angle_stats(lx, ly, mx, my, rx, ry)
 
-        # Calculate statistics
         stats = {
-            'left_angle_mean': round(df['left_angle_deg'].mean(), 2),
-            'left_angle_std': round(df['left_angle_deg'].std(), 2),
-            'right_angle_mean': round(df['right_angle_deg'].mean(), 2),
-            'right_angle_std': round(df['right_angle_deg'].std(), 2)
+            'left_angle_mean': round(left_mean, 2),
+            'left_angle_std': round(left_std, 2),
+            'right_angle_mean': round(right_mean, 2),
+            'right_angle_std': round(right_std, 2)
         }
 
         print("\nResults:")
@@ -28,6 +28,23 @@ import numpy as np
 import matplotlib.pyplot as plt
 from scipy import stats
 
+# Figure reused across main() calls so batch runs do not reallocate the canvas
+_FIG = None
+
+def get_figure():
+    """
+    Returns the shared figure and axes, cleared and made current for pyplot calls.
+    """
+    global _FIG
+    if _FIG is None:
+        _FIG = plt.figure(figsize=(12, 8))
+        _FIG.add_subplot()
+    ax = _FIG.axes[0]
+    ax.clear()
+    plt.figure(_FIG.number)
+    plt.sca(ax)
+    return _FIG, ax
+
 def add_significance_annotation(p_value, x1, x2, y, h, alpha=0.05):
     """
     Adds a significance annotation line and p-value text to the plot.
@@ -48,23 +65,35 @@ def add_significance_annotation(p_value, x1, x2, y, h, alpha=0.05):
     # Add the text
     plt.text((x1 + x2) * .5, y + h, sig_text, ha='center', va='bottom', fontsize=14)
 
+def stack_columns(columns):
+    """
+    Stacks 1-D arrays of different lengths into one NaN-padded 2-D array, one row each.
+    """
+    stacked = np.full((len(columns), max(len(c) for c in columns)), np.nan)
+    for row, column in zip(stacked, columns):
+        row[:len(column)] = column
+    return stacked
+
 def main(args):
     """
     Main function to load data, run t-test, and generate outputs.
     """
     # --- 1. Load Data ---
+    # Only the two angle columns are used; float32 is ample for angles within ±90°
+    angle_columns = ['left_angle_deg', 'right_angle_deg']
+    csv_options = dict(usecols=angle_columns, dtype={c: 'float32' for c in angle_columns}, engine='pyarrow')
     try:
-        male_df = pd.read_csv(args.male_data)
-        female_df = pd.read_csv(args.female_data)
+        male_df = pd.read_csv(args.male_data, **csv_options)
+        female_df = pd.read_csv(args.female_data, **csv_options)
     except FileNotFoundError as e:
         print(f"Error: {e}. Please check your file paths.")
         return
 
-    # Extract data columns, dropping any potential missing values
-    male_left = male_df['left_angle_deg'].dropna()
-    male_right = male_df['right_angle_deg'].dropna()
-    female_left = female_df['left_angle_deg'].dropna()
-    female_right = female_df['right_angle_deg'].dropna()
+    # Extract data columns as float32 arrays, dropping any potential missing values
+    male_left = male_df['left_angle_deg'].dropna().to_numpy(np.float32)
+    male_right = male_df['right_angle_deg'].dropna().to_numpy(np.float32)
+    female_left = female_df['left_angle_deg'].dropna().to_numpy(np.float32)
+    female_right = female_df['right_angle_deg'].dropna().to_numpy(np.float32)
 
     print(f"Loaded {len(male_left)} samples for Male group.")
     print(f"Loaded {len(female_left)} samples for Female group.")
@@ -73,6 +102,14 @@ def main(args):
     t_stat_left, p_value_left = stats.ttest_ind(male_left, female_left)
     t_stat_right, p_value_right = stats.ttest_ind(male_right, female_right)
 
+    # Mean and SEM of all four columns in one reduction over a NaN-padded array
+    stacked = stack_columns([male_left, male_right, female_left, female_right])
+    counts = np.isfinite(stacked).sum(axis=1)
+    means = np.nanmean(stacked, axis=1)
+    sems = np.nanstd(stacked, axis=1, ddof=1) / np.sqrt(counts)
+    male_means, female_means = means[:2], means[2:]
+    male_sems, female_sems = sems[:2], sems[2:]
+
     # --- 3. Save Statistical Results to a Text File ---
     results_path = os.path.join(args.output_dir, 'gender_t-test_results.txt')
     with open(results_path, 'w') as f:
@@ -81,26 +118,22 @@ def main(args):
         f.write(f"Male Group Data: {os.path.basename(args.male_data)}\n")
         f.write(f"Female Group Data: {os.path.basename(args.female_data)}\n\n")
         f.write("--- Left Angle Comparison ---\n")
-        f.write(f"Mean Male: {np.mean(male_left):.2f} ± {stats.sem(male_left):.2f}\n")
-        f.write(f"Mean Female: {np.mean(female_left):.2f} ± {stats.sem(female_left):.2f}\n")
+        f.write(f"Mean Male: {male_means[0]:.2f} ± {male_sems[0]:.2f}\n")
+        f.write(f"Mean Female: {female_means[0]:.2f} ± {female_sems[0]:.2f}\n")
         f.write(f"T-statistic: {t_stat_left:.3f}\n")
         f.write(f"P-value: {p_value_left:.5f}\n\n")
         f.write("--- Right Angle Comparison ---\n")
-        f.write(f"Mean Male: {np.mean(male_right):.2f} ± {stats.sem(male_right):.2f}\n")
-        f.write(f"Mean Female: {np.mean(female_right):.2f} ± {stats.sem(female_right):.2f}\n")
+        f.write(f"Mean Male: {male_means[1]:.2f} ± {male_sems[1]:.2f}\n")
+        f.write(f"Mean Female: {female_means[1]:.2f} ± {female_sems[1]:.2f}\n")
         f.write(f"T-statistic: {t_stat_right:.3f}\n")
         f.write(f"P-value: {p_value_right:.5f}\n")
     print(f"Statistical results saved to {results_path}")
 
     # --- 4. Create Visualization ---
     plt.style.use('seaborn-v0_8-whitegrid')
-    plt.figure(figsize=(12, 8))
+    get_figure()
 
     groups = ['Left Angle', 'Right Angle']
-    male_means = [np.mean(male_left), np.mean(male_right)]
-    female_means = [np.mean(female_left), np.mean(female_right)]
-    male_sems = [stats.sem(male_left), stats.sem(male_right)]
-    female_sems = [stats.sem(female_left), stats.sem(female_right)]
 
     x = np.arange(len(groups))
     width = 0.35
@@ -131,7 +164,6 @@ def main(args):
     
     plot_path = os.path.join(args.output_dir, 'gender_comparison_plot.png')
     plt.savefig(plot_path, dpi=300)
-    plt.close()
     print(f"Plot saved to {plot_path}")
 
 if __name__ == "__main__":
@@ -1,17 +1,38 @@
 import cv2
 import numpy as np
 import os
+import queue
+import threading
+from collections import deque
 
 class BarbellTracker:
     def __init__(self):
         # Initialize ArUco detector
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
         self.parameters = cv2.aruco.DetectorParameters()
+        # Fixed three-marker rig: fewer threshold passes, no tiny candidates, and no
+        # sub-pixel refinement since only the four-corner mean is used
+        self.parameters.adaptiveThreshWinSizeStep = 20
+        self.parameters.minMarkerPerimeterRate = 0.05
+        self.parameters.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_NONE
         self.detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.parameters)
         
         # Store trajectory
-        self.trajectory = []
         self.max_trajectory_points = 50
+        self.trajectory = deque(maxlen=self.max_trajectory_points)
+
+        # Reusable grayscale buffer, allocated once the frame size is known
+        self._gray = None
+
+        # Search region (x0, y0, x1, y1) around the last detected markers
+        self._bbox = None
+        self.roi_padding = 60
+
+        # Prerendered FPS/status overlay, refreshed every hud_interval frames
+        # or when the detected marker count changes
+        self.hud_interval = 30
+        self._hud_layers = None
+        self._hud_state = None
         
         # Ensure markers are generated
         self.generate_markers_if_needed()
@@ -32,27 +53,47 @@ class BarbellTracker:
 
     def detect_markers(self, frame):
         """Detect ArUco markers in the frame"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        corners, ids, rejected = self.detector.detectMarkers(gray)
-        
-        points = []
-        if ids is not None:
-            for i in range(len(ids)):
-                corner = corners[i][0]
-                center_x = int(np.mean(corner[:, 0]))
-                center_y = int(np.mean(corner[:, 1]))
-                points.append((center_x, center_y, ids[i][0]))
-            
-            points.sort(key=lambda x: x[2])
-        
-        return [(p[0], p[1]) for p in points]
+        if self._gray is None or self._gray.shape != frame.shape[:2]:
+            self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        # Search only around the markers found last frame, full frame on a miss
+        corners, ids = None, None
+        if self._bbox is not None:
+            x0, y0, x1, y1 = self._bbox
+            corners, ids, rejected = self.detector.detectMarkers(gray[y0:y1, x0:x1])
+            if ids is None or len(ids) < 3:
+                corners, ids = None, None
+            else:
+                offset = np.array([x0, y0], dtype=np.float32)
+                corners = [c + offset for c in corners]
+        if ids is None:
+            corners, ids, rejected = self.detector.detectMarkers(gray)
+
+        if ids is None:
+            self._bbox = None
+            return []
+
+        stacked = np.stack([c[0] for c in corners])
+        if len(ids) == 3:
+            h, w = gray.shape
+            x0, y0 = np.maximum(stacked.min(axis=(0, 1)).astype(np.int32) - self.roi_padding, 0)
+            x1, y1 = stacked.max(axis=(0, 1)).astype(np.int32) + self.roi_padding
+            self._bbox = (int(x0), int(y0), int(min(x1, w)), int(min(y1, h)))
+        else:
+            self._bbox = None
+
+        # Marker centers in one reduction over the (N, 4, 2) corner array, ordered by id
+        centers = stacked.mean(axis=1)
+        order = np.argsort(ids.ravel(), kind='stable')
+        return [tuple(p) for p in centers[order].astype(np.int32).tolist()]
 
     def draw_markers_and_lines(self, frame, points):
         """Draw marker points, connecting lines, and trajectory on the frame"""
         if len(points) == 3:
             # Draw marker points
-            colors = [(255,0,0), (0,255,0), (0,0,255)]  # BGR colors
-            labels = ["Left", "Middle", "Right"]
+            colors = ((255,0,0), (0,255,0), (0,0,255))  # BGR colors
+            labels = ("Left", "Middle", "Right")
             
             for i, point in enumerate(points):
                 cv2.circle(frame, point, 5, colors[i], -1)
@@ -60,20 +101,61 @@ class BarbellTracker:
                           (point[0] + 10, point[1] - 10),
                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, colors[i], 2)
             
-            # Draw connecting lines
-            cv2.line(frame, points[0], points[1], (255,0 , 255), 2)
-            cv2.line(frame, points[1], points[2], (255, 0, 255), 2)
+            # Draw connecting lines (Left-Middle-Right as one open polyline)
+            cv2.polylines(frame, [np.array(points, dtype=np.int32)], False, (255, 0, 255), 2)
             
-            # Update and draw trajectory
+            # Update and draw trajectory (deque drops the oldest point itself)
             self.trajectory.append(points[1])
-            if len(self.trajectory) > self.max_trajectory_points:
-                self.trajectory.pop(0)
-            
-            for i in range(1, len(self.trajectory)):
-                cv2.line(frame, 
-                        self.trajectory[i-1], 
-                        self.trajectory[i], 
-                        (255, 0, 0), 1)
+            if len(self.trajectory) > 1:
+                cv2.polylines(frame, [np.array(self.trajectory, dtype=np.int32)], False, (255, 0, 0), 1)
+
+    def draw_hud(self, frame, actual_fps, detected, frame_idx):
+        """Blend the cached FPS/status overlay, rerendering it only when it changes"""
+        if (self._hud_layers is None or detected != self._hud_state[1]
+                or frame_idx % self.hud_interval == 0):
+            fps_text = f"FPS: {actual_fps:.1f}"
+            status_text = f"Detected: {detected}/3"
+            status_color = (0, 255, 0) if detected == 3 else (0, 0, 255)
+            if self._hud_state is not None and frame_idx % self.hud_interval != 0:
+                fps_text = self._hud_state[0]  # Status change only: keep the shown FPS
+
+            # putText antialiases glyph edges, so render each line in white on black as a
+            # coverage mask and keep, for its bounding box, 1 - alpha and color * alpha
+            h, w = frame.shape[:2]
+            layers = []
+            for text, origin, color in ((fps_text, (10, 30), (0, 255, 0)),
+                                        (status_text, (10, 60), status_color)):
+                coverage = np.zeros((min(70, h), w), dtype=np.uint8)
+                cv2.putText(coverage, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 1, 255, 2)
+                x, y, box_w, box_h = cv2.boundingRect(coverage)
+                if box_w == 0 or box_h == 0:
+                    continue
+                alpha = cv2.merge([coverage[y:y + box_h, x:x + box_w].astype(np.float32) / 255] * 3)
+                layers.append((y, y + box_h, x, x + box_w, 1 - alpha, alpha * np.float32(color)))
+            self._hud_layers = layers
+            self._hud_state = (fps_text, detected)
+
+        # Blend each line over its box: frame * (1 - alpha) + color * alpha, rounded like putText
+        for y0, y1, x0, x1, inverse_alpha, color_alpha in self._hud_layers:
+            roi = frame[y0:y1, x0:x1]
+            cv2.add(cv2.multiply(roi, inverse_alpha, dtype=cv2.CV_32F), color_alpha, dst=roi, dtype=cv2.CV_8U)
+
+    def _capture_frames(self, cap, frames, stop):
+        """Producer thread: read frames into the queue, None marks the end"""
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.put(frame)
+        frames.put(None)
+
+    def _write_frames(self, out, writes):
+        """Consumer thread: encode frames from the queue until None arrives"""
+        while True:
+            frame = writes.get()
+            if frame is None:
+                break
+            out.write(frame)
 
     def process_video(self, video_path=0, output_path=None):
         """Process video or camera input"""
@@ -91,12 +173,25 @@ class BarbellTracker:
             out = cv2.VideoWriter(output_path, fourcc, fps, 
                                 (frame_width, frame_height))
         
+        # Capture and encoding run in their own threads so neither stalls detection;
+        # cv2.imshow / cv2.waitKey stay on the main thread as GUI backends require
+        stop = threading.Event()
+        frames = queue.Queue(maxsize=2)
+        writes = queue.Queue(maxsize=2)
+        capture_thread = threading.Thread(target=self._capture_frames, args=(cap, frames, stop), daemon=True)
+        capture_thread.start()
+        write_thread = None
+        if out:
+            write_thread = threading.Thread(target=self._write_frames, args=(out, writes), daemon=True)
+            write_thread.start()
+
         # For calculating actual frame rate
         prev_time = cv2.getTickCount()
+        frame_idx = 0
         
         while True:
-            ret, frame = cap.read()
-            if not ret:
+            frame = frames.get()
+            if frame is None:
                 break
             
             # Calculate actual frame rate
@@ -111,30 +206,34 @@ class BarbellTracker:
             self.draw_markers_and_lines(frame, points)
             
             # Display information
-            cv2.putText(frame, f"FPS: {actual_fps:.1f}", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            status_color = (0, 255, 0) if len(points) == 3 else (0, 0, 255)
-            cv2.putText(frame, f"Detected: {len(points)}/3", (10, 60),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
+            self.draw_hud(frame, actual_fps, len(points), frame_idx)
+            frame_idx += 1
             
             # Display results
             cv2.imshow('Barbell Tracking', frame)
             
-            # Save video
+            # Save video (frames stay host ndarrays: the ROI crop, centroid math and
+            # VideoWriter all need CPU memory, so a UMat round trip would only add copies)
             if out:
-                out.write(frame)
+                writes.put(frame)
             
             # Press 'q' to quit, press 's' to save current frame
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
+                # Stop the producer and drain it so it is not left blocked on put()
+                stop.set()
+                while frames.get() is not None:
+                    pass
                 break
             elif key == ord('s'):
                 cv2.imwrite('frame_capture.jpg', frame)
                 print("Frame saved as frame_capture.jpg")
         
+        capture_thread.join()
         cap.release()
         if out:
+            writes.put(None)
+            write_thread.join()
             out.release()
         cv2.destroyAllWindows()
 
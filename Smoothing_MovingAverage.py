@@ -1,24 +1,148 @@
 # 1. Import necessary libraries
+import math
 import pandas as pd
 import numpy as np
+import h5py
 import os
 import matplotlib
+matplotlib.use('Agg')  # Plots only go to files; no GUI/inline rendering pass
 import matplotlib.pyplot as plt
-from google.colab import files  # Import Colab file processing library
+from numba import njit, prange
 
 # 2. Data processing and plotting functions
 
+# No fastmath: 'nnan'/'ninf' would let LLVM drop the finiteness checks below
+@njit(parallel=True, cache=True)
+def _moving_average_2d(x, window_size, out):
+    """
+    Running-sum moving average of each column of x into out, zero-padded like np.convolve 'same'.
+    Non-finite samples (missing keypoints) are kept out of the sum and counted instead,
+    so only the outputs whose window contains one are NaN.
+    """
+    n = x.shape[0]
+    right = (window_size - 1) // 2
+    for c in prange(x.shape[1]):
+        s = 0.0
+        missing = 0
+        for i in range(n + right):
+            if i < n:
+                if math.isfinite(x[i, c]):
+                    s += x[i, c]
+                else:
+                    missing += 1
+            if i >= window_size:
+                if math.isfinite(x[i - window_size, c]):
+                    s -= x[i - window_size, c]
+                else:
+                    missing -= 1
+            if i >= right:
+                out[i - right, c] = s / window_size if missing == 0 else np.nan
+
 def moving_average(data, window_size):
-    """Apply moving average method to smooth data"""
+    """
+    Apply moving average method to smooth data (along axis 0, like np.convolve 'same').
+    A missing (NaN) sample only blanks the window_size outputs around it, as with np.convolve.
+    """
     if len(data) < window_size:
         raise ValueError("Data length must be greater than or equal to the window size.")
-    return np.convolve(data, np.ones(window_size) / window_size, mode='same')
+    x = np.asarray(data, dtype=np.float64)
+    x2d = x.reshape(len(x), -1)
+    out = np.empty_like(x2d)
+    _moving_average_2d(x2d, window_size, out)
+    return out.reshape(x.shape)
+
+def read_keypoint_table(input_file):
+    """
+    Read a DeepLabCut h5 file straight into NumPy, without pd.read_hdf's block concat copy.
+    :param input_file: Input h5 filename (pandas 'table' or 'fixed' format)
+    :return: (key, frame index array, column MultiIndex, (n_frames, n_columns) float64 keypoint array)
+    """
+    with h5py.File(input_file, 'r') as h5file:
+        key = next(iter(h5file))  # Assume there's only one DataFrame key
+        group = h5file[key]
+        if 'table' in group:
+            # format='table' (DeepLabCut output): read the records in one pass and slice out
+            # the index and values_block_0 fields (views, no per-field reads or copies)
+            table = group['table'][:]
+            index = table['index']
+            data = table['values_block_0']
+            if data.dtype != np.float64:
+                data = data.astype(np.float64)
+        elif 'block0_values' in group:
+            # format='fixed' (pandas default): decode directly into a preallocated array
+            dset = group['block0_values']
+            index = group['axis1'][:]
+            data = np.empty(dset.shape, dtype=np.float64)
+            dset.read_direct(data)
+        else:
+            raise ValueError("Input H5 file does not contain a DeepLabCut keypoint table!")
+
+    # Column labels only (zero rows are read): (scorer, bodyparts, coords)
+    columns = pd.read_hdf(input_file, key=key, stop=0).columns
+    if not isinstance(columns, pd.MultiIndex):
+        raise ValueError("Input H5 file does not have a MultiIndex structure!")
+    if len(columns) != data.shape[1]:
+        raise ValueError("Input H5 file stores keypoints in more than one block!")
+    return key, index, columns, data
+
+def write_keypoint_table(output_file, key, index, columns, data):
+    """
+    Write keypoint data as a pandas 'table' with the input's key and column labels,
+    so pd.read_hdf and DeepLabCut tools can load it.
+    :param output_file: Output h5 filename
+    :param key: Group name of the table (e.g. 'df_with_missing')
+    :param index: Frame index array
+    :param columns: (scorer, bodyparts, coords) column MultiIndex
+    :param data: (n_frames, n_columns) keypoint array, stored as float32
+    """
+    # Pixel coordinates need no float64 precision; float32 halves the bytes written and read
+    smoothed = pd.DataFrame(data.astype(np.float32), index=index, columns=columns)
+    smoothed.to_hdf(output_file, key=key, mode='w', format='table')
+
+def keypoint_xy_columns(columns):
+    """
+    Resolve the positions of the Left/Middle/Right x and y columns from the stored labels.
+    :param columns: (scorer, bodyparts, coords) column MultiIndex
+    :return: int array of column positions for left_x, left_y, middle_x, middle_y, right_x, right_y
+    """
+    scorer = columns.levels[0][0]  # Assume there's only one scorer
+    labels = [(scorer, bodypart, coord) for bodypart in ('Left', 'Middle', 'Right') for coord in ('x', 'y')]
+    positions = columns.get_indexer(labels)
+    missing = [label[1:] for label, position in zip(labels, positions) if position < 0]
+    if missing:
+        raise ValueError(f"Input H5 file is missing keypoint columns: {missing}")
+    return positions
+
+# Angle plot reused across calls; only the line data and title change
+_FIG = None
+_LINES = None
 
-def calculate_and_plot_angles(df, scorer, title, plot_filename, csv_filename):
+def get_angle_figure():
     """
-    A helper function to calculate angles from given DataFrame, save CSV and create plots.
-    :param df: Input DataFrame (can be original or smoothed)
-    :param scorer: Name of the DLC scorer
+    Return the shared angle figure and its left/right lines, rebuilding it if pyplot closed it.
+    :return: (figure, left Line2D, right Line2D)
+    """
+    global _FIG, _LINES
+    if _FIG is None or not plt.fignum_exists(_FIG.number):
+        _FIG, ax = plt.subplots(figsize=(12, 6))
+        left_line, = ax.plot([], [], label="Left Angle (deg)", color="blue", linewidth=1.5)
+        right_line, = ax.plot([], [], label="Right Angle (deg)", color="red", linewidth=1.5)
+        _LINES = (left_line, right_line)
+        ax.set_xlabel("Frame", fontsize=14)
+        ax.set_ylabel("Angle (deg)", fontsize=14)
+        ax.axhline(0, color="black", linestyle="--", linewidth=1)
+        # Expand Y-axis range to observe noise
+        ax.set_ylim(-10, 10)
+        ax.legend(fontsize=12)
+        ax.grid(True)
+    return (_FIG,) + _LINES
+
+def calculate_and_plot_angles(data, index, xy_columns, title, plot_filename, csv_filename):
+    """
+    A helper function to calculate angles from given keypoint array, save CSV and create plots.
+    :param data: (n_frames, n_columns) keypoint array (can be original or smoothed)
+    :param index: Frame index array
+    :param xy_columns: Positions of the Left/Middle/Right x and y columns (see keypoint_xy_columns)
     :param title: Title of the chart
     :param plot_filename: Output image filename
     :param csv_filename: Output CSV filename
@@ -27,51 +151,39 @@ def calculate_and_plot_angles(df, scorer, title, plot_filename, csv_filename):
     print(f"\n--- Processing for: {title} ---")
     
     # ---- Angle calculation ----
-    left_y_math = 1342 - df[(scorer, 'Left', 'y')]
-    middle_y_math = 1342 - df[(scorer, 'Middle', 'y')]
-    right_y_math = 1342 - df[(scorer, 'Right', 'y')]
-    
-    # Use .copy() to avoid SettingWithCopyWarning
-    df_calc = df.copy()
-    df_calc['left_dx'] = abs(df[(scorer, 'Left', 'x')] - df[(scorer, 'Middle', 'x')])
-    df_calc['right_dx'] = abs(df[(scorer, 'Right', 'x')] - df[(scorer, 'Middle', 'x')])
-    df_calc['left_dy'] = left_y_math - middle_y_math
-    df_calc['right_dy'] = right_y_math - middle_y_math
-
-    epsilon = 1e-9
-    left_angle_deg = np.degrees(np.arctan(df_calc['left_dy'] / (df_calc['left_dx'] + epsilon)))
-    right_angle_deg = np.degrees(np.arctan(df_calc['right_dy'] / (df_calc['right_dx'] + epsilon)))
-
-    left_angle_deg = np.round(left_angle_deg, 2)
-    right_angle_deg = np.round(right_angle_deg, 2)
-
-    result = pd.DataFrame({
-        'Frame': df.index,
-        'left_angle_deg': left_angle_deg,
-        'right_angle_deg': right_angle_deg
-    })
-
-    # Save angle results as CSV file
-    result.to_csv(csv_filename, index=False)
+    lx, ly, mx, my, rx, ry = data[:, xy_columns].T
+
+    # Y coordinates in the mathematical coordinate system: (1342 - ly) - (1342 - my) = my - ly
+    left_dx = np.abs(lx - mx)
+    right_dx = np.abs(rx - mx)
+    left_dy = my - ly
+    right_dy = my - ry
+
+    # atan2 needs no epsilon: dx == 0 gives +/-90 degrees (0 when dy == 0 too)
+    left_angle_deg = np.degrees(np.arctan2(left_dy, left_dx))
+    right_angle_deg = np.degrees(np.arctan2(right_dy, right_dx))
+
+    np.round(left_angle_deg, 2, out=left_angle_deg)
+    np.round(right_angle_deg, 2, out=right_angle_deg)
+
+    # Save angle results as CSV file (written by NumPy, no DataFrame round trip)
+    np.savetxt(csv_filename, np.column_stack((index, left_angle_deg, right_angle_deg)),
+               fmt=['%d', '%.2f', '%.2f'], delimiter=',',
+               header='Frame,left_angle_deg,right_angle_deg', comments='')
     print(f"Angle results saved to {csv_filename}")
 
     # --- Plotting section ---
-    plt.figure(figsize=(12, 6))
-    plt.plot(result['Frame'].values, result['left_angle_deg'].values, label="Left Angle (deg)", color="blue", linewidth=1.5)
-    plt.plot(result['Frame'].values, result['right_angle_deg'].values, label="Right Angle (deg)", color="red", linewidth=1.5)
-    plt.title(title, fontsize=16)
-    plt.xlabel("Frame", fontsize=14)
-    plt.ylabel("Angle (deg)", fontsize=14)
-    plt.axhline(0, color="black", linestyle="--", linewidth=1)
-    # Expand Y-axis range to observe noise
-    plt.ylim(-10, 10)
-    plt.legend(fontsize=12)
-    plt.grid(True)
-    plt.tight_layout()
-
-    plt.savefig(plot_filename)
+    fig, left_line, right_line = get_angle_figure()
+    ax = fig.axes[0]
+    left_line.set_data(index, left_angle_deg)
+    right_line.set_data(index, right_angle_deg)
+    ax.set_title(title, fontsize=16)
+    ax.relim()
+    ax.autoscale_view(scaley=False)  # Keep the fixed Y range
+    fig.tight_layout()
+
+    fig.savefig(plot_filename)
     print(f"Angle plot saved to {plot_filename}")
-    plt.show() # Display image in Colab
     
     return [csv_filename, plot_filename]
 
@@ -82,44 +194,28 @@ def process_h5_file(input_file, output_file, window_size=21):
     """
     # Read h5 file
     print(f"Reading data from {input_file}...")
-    original_data = pd.read_hdf(input_file)
-
-    if not isinstance(original_data.columns, pd.MultiIndex):
-        raise ValueError("Input H5 file does not have a MultiIndex structure!")
-
-    scorer = original_data.columns.levels[0][0]
+    key, index, columns, original_data = read_keypoint_table(input_file)
+    xy_columns = keypoint_xy_columns(columns)
     
     # --- Key modification: Process data before smoothing here first ---
     base_name = os.path.splitext(output_file)[0]
     plot_file_before = f"{base_name}_angles_BEFORE_smoothing.png"
     csv_file_before = f"{base_name}_angles_BEFORE_smoothing.csv"
-    files_before = calculate_and_plot_angles(original_data, scorer, "Angles Before Smoothing", plot_file_before, csv_file_before)
+    files_before = calculate_and_plot_angles(original_data, index, xy_columns, "Angles Before Smoothing", plot_file_before, csv_file_before)
 
     # --- Perform smoothing process ---
     print("\n--- Applying moving average for smoothing ---")
-    keypoints = original_data.columns.levels[1]
-    coordinates = original_data.columns.levels[2]
-    smoothed_data_dict = {}
-
-    for keypoint in keypoints:
-        for coordinate in coordinates:
-            try:
-                data_col = original_data[(scorer, keypoint, coordinate)].values
-                smoothed_values = moving_average(data_col, window_size)
-                smoothed_data_dict[(scorer, keypoint, coordinate)] = smoothed_values
-            except KeyError:
-                print(f"Warning: Data for ({keypoint}, {coordinate}) not found!")
-    
-    smoothed_data = pd.DataFrame(smoothed_data_dict, index=original_data.index)
+    # Smooth every column in one pass over the (frames, columns) array
+    smoothed_data = moving_average(original_data, window_size)
 
     print(f"\nSaving smoothed data to {output_file}...")
-    smoothed_data.to_hdf(output_file, key="df", mode="w")
+    write_keypoint_table(output_file, key, index, columns, smoothed_data)
     print("Processing complete!")
 
     # --- Key modification: Process data after smoothing here ---
     plot_file_after = f"{base_name}_angles_AFTER_smoothing.png"
     csv_file_after = f"{base_name}_angles_AFTER_smoothing.csv"
-    files_after = calculate_and_plot_angles(smoothed_data, scorer, f"Angles After Smoothing (Window Size = {window_size})", plot_file_after, csv_file_after)
+    files_after = calculate_and_plot_angles(smoothed_data, index, xy_columns, f"Angles After Smoothing (Window Size = {window_size})", plot_file_after, csv_file_after)
     
     # Return all generated filenames
     return [output_file] + files_before + files_after
@@ -128,25 +224,38 @@ def process_h5_file(input_file, output_file, window_size=21):
 # Main execution flow
 # -----------------------------------------------------
 
-# 3. Upload file
-print("Please upload your H5 file...")
-uploaded = files.upload()
+def main():
+    """Colab entry point: upload an H5 file, process it, and download the results."""
+    from google.colab import files  # Import Colab file processing library (only needed here)
+    from IPython.display import Image, display
+
+    # 3. Upload file
+    print("Please upload your H5 file...")
+    uploaded = files.upload()
+
+    if not uploaded:
+        print("No file was uploaded. Please run the cell again.")
+    else:
+        input_h5_file = next(iter(uploaded))
+        print(f"\nSuccessfully uploaded: {input_h5_file}")
+
+        # 4. Define output filename
+        base_name = os.path.splitext(input_h5_file)[0]
+        output_h5_file = f"{base_name}_output.h5"
 
-if not uploaded:
-    print("No file was uploaded. Please run the cell again.")
-else:
-    input_h5_file = next(iter(uploaded))
-    print(f"\nSuccessfully uploaded: {input_h5_file}")
+        # 5. Call main function for processing and plotting
+        generated_files = process_h5_file(input_h5_file, output_h5_file)
 
-    # 4. Define output filename
-    base_name = os.path.splitext(input_h5_file)[0]
-    output_h5_file = f"{base_name}_output.h5"
+        # Display the saved plots in Colab (the PNGs are shown as-is, not re-rendered)
+        for f in generated_files:
+            if f.endswith('.png'):
+                display(Image(filename=f))
 
-    # 5. Call main function for processing and plotting
-    generated_files = process_h5_file(input_h5_file, output_h5_file)
+        # 6. Download all generated result files
+        print("\nDownloading your result files...")
+        for f in generated_files:
+            files.download(f)
+        print("All files have been downloaded.")
 
-    # 6. Download all generated result files
-    print("\nDownloading your result files...")
-    for f in generated_files:
-        files.download(f)
-    print("All files have been downloaded.")
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,8 @@ Example:
 
 import argparse
 import os
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy import stats
@@ -47,30 +48,56 @@ def add_significance_annotation(p_value, x1, x2, y, h, alpha=0.05):
     # Add the text
     plt.text((x1 + x2) * .5, y + h, sig_text, ha='center', va='bottom', fontsize=14)
 
+def read_angle_columns(path):
+    """
+    Reads only the left/right angle columns of a CSV file with pyarrow.
+    Returns them as two float64 arrays with missing values dropped.
+    """
+    angle_columns = ['left_angle_deg', 'right_angle_deg']
+    convert_options = pacsv.ConvertOptions(include_columns=angle_columns,
+                                           column_types={c: pa.float64() for c in angle_columns})
+    table = pacsv.read_csv(path, convert_options=convert_options)
+    columns = [table[c].to_numpy() for c in angle_columns]  # Missing values arrive as NaN
+    return [values[~np.isnan(values)] for values in columns]
+
+def stack_columns(columns):
+    """
+    Stacks 1-D arrays of different lengths into one NaN-padded 2-D array, one row each.
+    """
+    stacked = np.full((len(columns), max(len(c) for c in columns)), np.nan)
+    for row, column in zip(stacked, columns):
+        row[:len(column)] = column
+    return stacked
+
 def main(args):
     """
     Main function to load data, run t-test, and generate outputs.
     """
     # --- 1. Load Data ---
+    # Extract data columns, dropping any potential missing values
     try:
-        group1_df = pd.read_csv(args.group1_data)
-        group2_df = pd.read_csv(args.group2_data)
+        group1_left, group1_right = read_angle_columns(args.group1_data)
+        group2_left, group2_right = read_angle_columns(args.group2_data)
     except FileNotFoundError as e:
         print(f"Error: {e}. Please check your file paths.")
         return
 
-    # Extract data columns, dropping any potential missing values
-    group1_left = group1_df['left_angle_deg'].dropna()
-    group1_right = group1_df['right_angle_deg'].dropna()
-    group2_left = group2_df['left_angle_deg'].dropna()
-    group2_right = group2_df['right_angle_deg'].dropna()
-
     print(f"Loaded {len(group1_left)} samples for Group 1.")
     print(f"Loaded {len(group2_left)} samples for Group 2.")
 
     # --- 2. Perform T-tests ---
-    t_stat_left, p_value_left = stats.ttest_ind(group1_left, group2_left)
-    t_stat_right, p_value_right = stats.ttest_ind(group1_right, group2_right)
+    # Left and right tested in one call on NaN-padded (2, n) arrays, one row per angle
+    group1 = stack_columns([group1_left, group1_right])
+    group2 = stack_columns([group2_left, group2_right])
+    t_stats, p_values = stats.ttest_ind(group1, group2, axis=1, nan_policy='omit')
+    t_stat_left, t_stat_right = t_stats
+    p_value_left, p_value_right = p_values
+
+    # Mean and SEM of both angles per group with the same row-wise reductions
+    group1_means = np.nanmean(group1, axis=1)
+    group2_means = np.nanmean(group2, axis=1)
+    group1_sems = np.nanstd(group1, axis=1, ddof=1) / np.sqrt(np.isfinite(group1).sum(axis=1))
+    group2_sems = np.nanstd(group2, axis=1, ddof=1) / np.sqrt(np.isfinite(group2).sum(axis=1))
 
     # --- 3. Save Statistical Results to a Text File ---
     results_path = os.path.join(args.output_dir, 't-test_results.txt')
@@ -80,13 +107,13 @@ def main(args):
         f.write(f"Group 1 (Heavy): {os.path.basename(args.group1_data)}\n")
         f.write(f"Group 2 (Light): {os.path.basename(args.group2_data)}\n\n")
         f.write("--- Left Angle Comparison ---\n")
-        f.write(f"Mean Group 1: {np.mean(group1_left):.2f} ± {stats.sem(group1_left):.2f}\n")
-        f.write(f"Mean Group 2: {np.mean(group2_left):.2f} ± {stats.sem(group2_left):.2f}\n")
+        f.write(f"Mean Group 1: {group1_means[0]:.2f} ± {group1_sems[0]:.2f}\n")
+        f.write(f"Mean Group 2: {group2_means[0]:.2f} ± {group2_sems[0]:.2f}\n")
         f.write(f"T-statistic: {t_stat_left:.3f}\n")
         f.write(f"P-value: {p_value_left:.5f}\n\n")
         f.write("--- Right Angle Comparison ---\n")
-        f.write(f"Mean Group 1: {np.mean(group1_right):.2f} ± {stats.sem(group1_right):.2f}\n")
-        f.write(f"Mean Group 2: {np.mean(group2_right):.2f} ± {stats.sem(group2_right):.2f}\n")
+        f.write(f"Mean Group 1: {group1_means[1]:.2f} ± {group1_sems[1]:.2f}\n")
+        f.write(f"Mean Group 2: {group2_means[1]:.2f} ± {group2_sems[1]:.2f}\n")
         f.write(f"T-statistic: {t_stat_right:.3f}\n")
         f.write(f"P-value: {p_value_right:.5f}\n")
     print(f"Statistical results saved to {results_path}")
@@ -96,10 +123,6 @@ def main(args):
     plt.figure(figsize=(12, 8))
 
     groups = ['Left Angle', 'Right Angle']
-    group1_means = [np.mean(group1_left), np.mean(group1_right)]
-    group2_means = [np.mean(group2_left), np.mean(group2_right)]
-    group1_sems = [stats.sem(group1_left), stats.sem(group1_right)]
-    group2_sems = [stats.sem(group2_left), stats.sem(group2_right)]
 
     x = np.arange(len(groups))
     width = 0.35
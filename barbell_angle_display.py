@@ -1,7 +1,9 @@
 import cv2
 import h5py
 import numpy as np
-import math
+import os
+import queue
+import threading
 
 # Configure paths
 video_path = '/Users/a/Desktop/ゼミ用Folder/BarTracking_Videos/TestVideo/TestObject_2.mp4'
@@ -10,16 +12,22 @@ output_video_path = '/Users/a/Desktop/ゼミ用Folder/BarTracking_Videos/TestVid
 
 # Read HDF5 data
 with h5py.File(result_path, 'r') as h5file:
-    table = h5file['df_with_missing/table'][:]
-    keypoints = table['values_block_0']
+    # Read the compound records in one pass (h5py's per-field reads go through a slower
+    # conversion path), then take the values_block_0 view and only its x/y columns
+    keypoints = h5file['df_with_missing/table'][:]['values_block_0']
+coords = keypoints[:, [0, 1, 3, 4, 6, 7]]  # (frames, [Lx, Ly, Mx, My, Rx, Ry]), one contiguous array
 
-# Extract keypoint data
-left_x, left_y = keypoints[:, 0], keypoints[:, 1]
-middle_x, middle_y = keypoints[:, 3], keypoints[:, 4]
-right_x, right_y = keypoints[:, 6], keypoints[:, 7]
+# Extract keypoint data (column views, no copies)
+left_x, left_y, middle_x, middle_y, right_x, right_y = coords.T
+
+def open_video_capture(path):
+    """Open the video on the FFmpeg backend with one decoder thread per CPU core"""
+    return cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_N_THREADS, os.cpu_count() or 1])
 
 # Open video
-cap = cv2.VideoCapture(video_path)
+cap = open_video_capture(video_path)
+if not cap.isOpened():
+    raise IOError(f"Cannot open video file: {video_path}")
 
 # Get video information
 frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -27,18 +35,59 @@ frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 fps = int(cap.get(cv2.CAP_PROP_FPS))
 total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
+def open_video_writer(path, fps, size):
+    """
+    Open an H.264 writer on a hardware encoder when FFmpeg has one, else software H.264 at
+    x264's fastest preset, else fall back to mp4v
+    """
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    out = cv2.VideoWriter(path, cv2.CAP_FFMPEG, fourcc, fps, size, params)
+    if out.isOpened() and out.get(cv2.VIDEOWRITER_PROP_HW_ACCELERATION) == cv2.VIDEO_ACCELERATION_NONE:
+        # Software encoder: reopen with ultrafast (FFmpeg writer options are read when opening)
+        out.release()
+        previous = os.environ.get('OPENCV_FFMPEG_WRITER_OPTIONS')
+        os.environ['OPENCV_FFMPEG_WRITER_OPTIONS'] = 'preset;ultrafast'
+        try:
+            out = cv2.VideoWriter(path, cv2.CAP_FFMPEG, fourcc, fps, size)
+        finally:
+            if previous is None:
+                del os.environ['OPENCV_FFMPEG_WRITER_OPTIONS']
+            else:
+                os.environ['OPENCV_FFMPEG_WRITER_OPTIONS'] = previous
+    if not out.isOpened():
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    return out
+
 # Prepare video writer
-out = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_width, frame_height))
+out = open_video_writer(output_video_path, fps, (frame_width, frame_height))
+
+def read_frames(cap, frames, count):
+    """Decode thread: read up to count frames into the queue, None marks the end"""
+    for _ in range(count):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.put(frame)
+    frames.put(None)
+
+def write_frames(out, writes):
+    """Encode thread: write frames from the queue until None arrives"""
+    while True:
+        frame = writes.get()
+        if frame is None:
+            break
+        out.write(frame)
 
 def calculate_angle(p1, p2, is_left=True):
     """
     Calculate the angle between a line segment and horizontal line
-    p1, p2: coordinates of the two endpoints of the line segment (x, y)
+    p1, p2: coordinates of the two endpoints of the line segment (x, y), scalars or per-frame arrays
     is_left: whether it's the left side angle
     """
     dx = p2[0] - p1[0]
     dy = p2[1] - p1[1]
-    angle = math.degrees(math.atan2(-dy, dx))
+    angle = np.degrees(np.arctan2(-dy, dx))
     
     # Adjust for left side angle: simply negate
     if is_left:
@@ -51,56 +100,79 @@ horizontal_line_length = 100
 # Line colors
 line_color = (0, 255, 0)  # Green
 text_color = (0, 0, 0)    # Black
+horizontal_color = (0, 255, 255)  # Yellow
+# Text constants, bound once instead of per frame
+font = cv2.FONT_HERSHEY_SIMPLEX
+frame_info_anchor = (10, 30)
+frame_info_total = f"/{total_frames}"
+# Frames between progress updates
+progress_interval = 30
+
+# Calculate angles between left and right line segments and horizontal line for all frames at once
+left_angles = calculate_angle((left_x, left_y), (middle_x, middle_y), is_left=True)
+right_angles = calculate_angle((middle_x, middle_y), (right_x, right_y), is_left=False)
+
+# Integer drawing geometry for every frame in one vectorized pass (truncated like int())
+points = coords.reshape(-1, 3, 2).astype(np.int32)  # (frames, [L, M, R], [x, y])
+middle = points[:, 1]
+half_line = np.array([horizontal_line_length // 2, 0], dtype=np.int32)
+horizontal_lines = np.stack((middle - half_line, middle + half_line), axis=1)  # (frames, 2, 2)
+left_text_anchors = [tuple(p) for p in (middle + (-120, -20)).tolist()]
+right_text_anchors = [tuple(p) for p in (middle + (20, -20)).tolist()]
+
+# Decode and encode run in their own threads; the main thread only draws
+frames = queue.Queue(maxsize=8)
+writes = queue.Queue(maxsize=8)
+read_thread = threading.Thread(target=read_frames, args=(cap, frames, len(coords)), daemon=True)
+write_thread = threading.Thread(target=write_frames, args=(out, writes), daemon=True)
+read_thread.start()
+write_thread.start()
 
 frame_idx = 0
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret or frame_idx >= len(left_x):
+while True:
+    frame = frames.get()
+    if frame is None:
         break
 
     try:
-        x = [left_x[frame_idx], middle_x[frame_idx], right_x[frame_idx]]
-        y = [left_y[frame_idx], middle_y[frame_idx], right_y[frame_idx]]
-        
-        # Draw skeleton lines
-        cv2.line(frame, (int(x[0]), int(y[0])), (int(x[1]), int(y[1])), line_color, 2)
-        cv2.line(frame, (int(x[1]), int(y[1])), (int(x[2]), int(y[2])), line_color, 2)
+        # Draw skeleton lines (Left-Middle-Right as one open polyline)
+        cv2.polylines(frame, [points[frame_idx]], False, line_color, 2)
         
         # Draw horizontal line at the midpoint
-        middle_x_int = int(x[1])
-        middle_y_int = int(y[1])
-        horizontal_start = (middle_x_int - horizontal_line_length//2, middle_y_int)
-        horizontal_end = (middle_x_int + horizontal_line_length//2, middle_y_int)
-        cv2.line(frame, horizontal_start, horizontal_end, (0, 255, 255), 2)  # Yellow horizontal line
+        cv2.polylines(frame, [horizontal_lines[frame_idx]], False, horizontal_color, 2)
 
-        # Calculate angles between left and right line segments and horizontal line
-        left_angle = calculate_angle((x[0], y[0]), (x[1], y[1]), is_left=True)
-        right_angle = calculate_angle((x[1], y[1]), (x[2], y[2]), is_left=False)
+        left_angle = left_angles[frame_idx]
+        right_angle = right_angles[frame_idx]
 
         # Display angles on the screen (pure black text)
-        cv2.putText(frame, f"L: {left_angle:.1f}deg", 
-                   (middle_x_int - 120, middle_y_int - 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+        cv2.putText(frame, f"L: {left_angle:.1f}deg", left_text_anchors[frame_idx],
+                   font, 0.5, text_color, 2, cv2.LINE_8, False)
         
-        cv2.putText(frame, f"R: {right_angle:.1f}deg", 
-                   (middle_x_int + 20, middle_y_int - 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+        cv2.putText(frame, f"R: {right_angle:.1f}deg", right_text_anchors[frame_idx],
+                   font, 0.5, text_color, 2, cv2.LINE_8, False)
         
         # Display frame information
-        cv2.putText(frame, f"Frame: {frame_idx}/{total_frames}", 
-                   (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+        cv2.putText(frame, f"Frame: {frame_idx}{frame_info_total}", frame_info_anchor,
+                   font, 1, text_color, 2, cv2.LINE_8, False)
         
     except IndexError:
         print("Frame index out of range, processing completed")
+        # Drain the decode queue so the reader is not left blocked on put()
+        while frames.get() is not None:
+            pass
         break
 
     # Write to video
-    out.write(frame)
+    writes.put(frame)
     frame_idx += 1
 
-    print(f"Processing frame {frame_idx}/{total_frames}", end='\r')
+    # Print progress about once a second of video, and on the last frame
+    if frame_idx % progress_interval == 0 or frame_idx == total_frames:
+        print(f"Processing frame {frame_idx}/{total_frames}", end='\r', flush=True)
 
+read_thread.join()
+writes.put(None)
+write_thread.join()
 cap.release()
 out.release()
 
@@ -1,6 +1,66 @@
 import cv2
 import h5py
 import numpy as np
+import os
+import queue
+import threading
+
+def scan_frames(cap, frames, windows):
+    """
+    Decode thread: one forward pass over the video. Frames outside the (start, end) windows
+    are only grab()bed; frames inside are retrieve()d and queued as (window number, index, frame).
+    None marks the end.
+    """
+    position = 0
+    for number, (start, end) in enumerate(windows):
+        while position < end:
+            if not cap.grab():
+                frames.put(None)
+                return
+            if position >= start:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    frames.put(None)
+                    return
+                frames.put((number, position, frame))
+            position += 1
+    frames.put(None)
+
+def write_frames(out, writes):
+    """Encode thread: write frames from the queue until None arrives"""
+    while True:
+        frame = writes.get()
+        if frame is None:
+            break
+        out.write(frame)
+
+def open_video_capture(path):
+    """Open the video on the FFmpeg backend with one decoder thread per CPU core"""
+    return cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_N_THREADS, os.cpu_count() or 1])
+
+def open_video_writer(path, fps, size):
+    """
+    Open an H.264 writer on a hardware encoder when FFmpeg has one, else software H.264 at
+    x264's fastest preset, else fall back to mp4v
+    """
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    out = cv2.VideoWriter(path, cv2.CAP_FFMPEG, fourcc, fps, size, params)
+    if out.isOpened() and out.get(cv2.VIDEOWRITER_PROP_HW_ACCELERATION) == cv2.VIDEO_ACCELERATION_NONE:
+        # Software encoder: reopen with ultrafast (FFmpeg writer options are read when opening)
+        out.release()
+        previous = os.environ.get('OPENCV_FFMPEG_WRITER_OPTIONS')
+        os.environ['OPENCV_FFMPEG_WRITER_OPTIONS'] = 'preset;ultrafast'
+        try:
+            out = cv2.VideoWriter(path, cv2.CAP_FFMPEG, fourcc, fps, size)
+        finally:
+            if previous is None:
+                del os.environ['OPENCV_FFMPEG_WRITER_OPTIONS']
+            else:
+                os.environ['OPENCV_FFMPEG_WRITER_OPTIONS'] = previous
+    if not out.isOpened():
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    return out
 
 # Configure paths
 video_path = '/Users/a/Desktop/ゼミ用Folder/BarTracking_Videos/TestVideo/TestObject_2.mp4'
@@ -9,16 +69,20 @@ output_video_path = '/Users/a/Desktop/ゼミ用Folder/BarTracking_Videos/TestVid
 
 # Read HDF5 data
 with h5py.File(result_path, 'r') as h5file:
-    table = h5file['df_with_missing/table'][:]
-    keypoints = table['values_block_0']
+    # Read the compound records in one pass (h5py's per-field reads go through a slower
+    # conversion path), then take the values_block_0 view and only its x/y columns
+    keypoints = h5file['df_with_missing/table'][:]['values_block_0']
+coords = keypoints[:, [0, 1, 3, 4, 6, 7]]  # (frames, [Lx, Ly, Mx, My, Rx, Ry]), one contiguous array
 
-# Extract keypoint data
-left_x, left_y = keypoints[:, 0], keypoints[:, 1]
-middle_x, middle_y = keypoints[:, 3], keypoints[:, 4]
-right_x, right_y = keypoints[:, 6], keypoints[:, 7]
+# Integer pixel geometry for every frame in one pass: (frames, [left, middle, right], [x, y])
+points = coords.reshape(-1, 3, 2).astype(np.int32)
+# Trajectory segments from each frame's keypoints to the next: (frames - 1, 3, [from, to], [x, y])
+trajectory_segments = np.stack((points[:-1], points[1:]), axis=2)
 
 # Open video
-cap = cv2.VideoCapture(video_path)
+cap = open_video_capture(video_path)
+if not cap.isOpened():
+    raise IOError(f"Cannot open video file: {video_path}")
 
 # Get video information
 frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -32,76 +96,85 @@ phase2_start = int(5 * fps)  # Phase 2 start (6 seconds)
 phase2_end = int(8 * fps)    # Phase 2 end (8 seconds)
 
 # Prepare video writer
-out = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_width, frame_height))
+out = open_video_writer(output_video_path, fps, (frame_width, frame_height))
 
 # Define colors for each phase
 phase1_color = (255, 0, 255)    # Blue for phase 1
 phase2_color = (255, 0, 255)    # Green for phase 2
 
-# Process two phases
-for phase in [1, 2]:
-    # Create new overlay layer for each phase
-    overlay = np.zeros((frame_height, frame_width, 3), dtype=np.uint8)
-    
-    # Set phase parameters
-    if phase == 1:
-        start_frame = phase1_start
-        end_frame = phase1_end
-        color = phase1_color
-    else:
-        start_frame = phase2_start
-        end_frame = phase2_end
-        color = phase2_color
-    
-    # Jump to starting frame
-    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-    frame_idx = start_frame
-    
-    # Reset previous frame coordinates
-    last_x = None
-    last_y = None
+# Phase frame ranges, clipped to the frames that have keypoints
+phases = [(phase1_start, phase1_end, phase1_color), (phase2_start, phase2_end, phase2_color)]
+windows = [(start, min(end, len(coords))) for start, end, _ in phases]
+
+# Frames between progress updates
+progress_interval = 30
+
+# One sequential scan on a decode thread (no seeking), drawing on the main thread,
+# encoding on its own thread
+frames = queue.Queue(maxsize=8)
+writes = queue.Queue(maxsize=8)
+read_thread = threading.Thread(target=scan_frames, args=(cap, frames, windows), daemon=True)
+write_thread = threading.Thread(target=write_frames, args=(out, writes), daemon=True)
+read_thread.start()
+write_thread.start()
+
+# Single-channel mask of drawn pixels, allocated once and cleared between phases
+overlay = np.zeros((frame_height, frame_width), dtype=np.uint8)
+x0 = y0 = x1 = y1 = 0
+
+current_phase = None
+while True:
+    item = frames.get()
+    if item is None:
+        break
+    phase_number, frame_idx, frame = item
+
+    if phase_number != current_phase:
+        # Start a new overlay layer for each phase: clear only the box drawn in the previous phase,
+        # and color the mask through a lookup table (255 -> phase color) only where it is blended
+        current_phase = phase_number
+        phase = phase_number + 1
+        start_frame, end_frame, color = phases[phase_number]
+        overlay[y0:y1, x0:x1] = 0
+        color_lut = np.zeros((1, 256, 3), dtype=np.uint8)
+        color_lut[0, 255] = color
+        drawn_min = np.array([frame_width, frame_height], dtype=np.int32)
+        drawn_max = np.array([-1, -1], dtype=np.int32)
+
+    # Draw skeleton lines (Left-Middle-Right as one open polyline)
+    current = points[frame_idx]
+    cv2.polylines(overlay, [current], False, 255, 2)
     
-    # Process frames in current phase
-    while cap.isOpened() and frame_idx < end_frame:
-        ret, frame = cap.read()
-        if not ret or frame_idx >= len(left_x):
-            break
+    # After the first frame of the phase, draw the three precomputed trajectory segments
+    if frame_idx > start_frame:
+        cv2.polylines(overlay, trajectory_segments[frame_idx - 1], False, 255, 1)
 
-        try:
-            # Get keypoints for current frame
-            x = [left_x[frame_idx], middle_x[frame_idx], right_x[frame_idx]]
-            y = [left_y[frame_idx], middle_y[frame_idx], right_y[frame_idx]]
-            
-            # Draw skeleton lines
-            cv2.line(overlay, (int(x[0]), int(y[0])), (int(x[1]), int(y[1])), color, 2)
-            cv2.line(overlay, (int(x[1]), int(y[1])), (int(x[2]), int(y[2])), color, 2)
-            
-            # If previous frame coordinates exist, draw trajectory lines
-            if last_x is not None:
-                for i in range(3):
-                    cv2.line(overlay, 
-                            (int(last_x[i]), int(last_y[i])), 
-                            (int(x[i]), int(y[i])), 
-                            color, 1)
-            
-            # Update previous frame coordinates
-            last_x = x.copy()
-            last_y = y.copy()
-            
-        except IndexError:
-            print(f"Phase {phase} frame index out of range, processing completed")
-            break
+    # Grow the bounding box of everything drawn this phase (padded for line thickness)
+    np.minimum(drawn_min, current.min(axis=0), out=drawn_min)
+    np.maximum(drawn_max, current.max(axis=0), out=drawn_max)
+    x0, y0 = np.maximum(drawn_min - 2, 0).tolist()
+    x1, y1 = np.minimum(drawn_max + 3, (frame_width, frame_height)).tolist()
 
-        # Overlay layers
-        combined = cv2.addWeighted(frame, 0.6, overlay, 0.9, 0)
+    # Overlay layers: the overlay is zero outside the box, where the blend reduces to 0.6 * frame,
+    # so only the box reads the overlay and the rest is a plain scale of the decoded frame
+    if x1 > x0 and y1 > y0:
+        overlay_roi = cv2.LUT(cv2.cvtColor(overlay[y0:y1, x0:x1], cv2.COLOR_GRAY2BGR), color_lut)
+        blended = cv2.addWeighted(frame[y0:y1, x0:x1], 0.6, overlay_roi, 0.9, 0)
+        cv2.convertScaleAbs(frame, dst=frame, alpha=0.6)
+        frame[y0:y1, x0:x1] = blended
+    else:
+        cv2.convertScaleAbs(frame, dst=frame, alpha=0.6)
 
-        # Write to video
-        out.write(combined)
-        frame_idx += 1
+    # Write to video
+    writes.put(frame)
 
-        # Print progress
-        print(f"Processing phase {phase}: frame {frame_idx}/{end_frame}", end='\r')
+    # Print progress about once a second of video, and on the last frame of each phase
+    if (frame_idx + 1) % progress_interval == 0 or frame_idx + 1 == windows[phase_number][1]:
+        print(f"Processing phase {phase}: frame {frame_idx + 1}/{end_frame}", end='\r', flush=True)
 
+read_thread.join()
+writes.put(None)
+write_thread.join()
 cap.release()
 out.release()
 